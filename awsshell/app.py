@@ -5,14 +5,17 @@ Main entry point to the AWS Shell.
 """
 from __future__ import unicode_literals
 import os
+import shutil
 import subprocess
 import logging
+import signal
 import sys
+import tempfile
 
 from prompt_toolkit.document import Document
 from prompt_toolkit.shortcuts import create_eventloop
 from prompt_toolkit.buffer import Buffer
-from prompt_toolkit.filters import Always
+from prompt_toolkit.filters import Always, Condition
 from prompt_toolkit.interface import CommandLineInterface, Application
 from prompt_toolkit.interface import AbortAction, AcceptAction
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
@@ -24,28 +27,21 @@ from awsshell.config import Config
 from awsshell.keys import KeyManager
 from awsshell.style import StyleFactory
 from awsshell.toolbar import Toolbar
-from awsshell.utils import build_config_file_path, temporary_file
+from awsshell.utils import build_config_file_path
 from awsshell import compat
 
 
 LOG = logging.getLogger(__name__)
 EXIT_REQUESTED = object()
+_RESTORED_SIGNALS = tuple(
+    getattr(signal, name) for name in ('SIGPIPE', 'SIGXFSZ')
+    if hasattr(signal, name))
 
 
 def create_aws_shell(completer, model_completer, docs):
     return AWSShell(completer, model_completer, docs)
 
 
-class InputInterrupt(Exception):
-    """Stops the input of commands.
-
-    Raising `InputInterrupt` is useful to force a cli rebuild, which is
-    sometimes necessary in order for config changes to take effect.
-
-    """
-    pass
-
-
 class ChangeDirHandler(object):
     def __init__(self, output=sys.stdout, err=sys.stderr, chdir=os.chdir):
         self._output = output
@@ -64,6 +60,73 @@ class ChangeDirHandler(object):
             self._err.write("cd: %s\n" % e)
 
 
+class EditHistoryFile(object):
+    """A file on disk mirroring the shell's command history.
+
+    The file lives for the lifetime of the shell.  As long as it is
+    unchanged since the last sync, only the commands run since then are
+    appended, so opening the history in an editor doesn't rewrite the
+    whole history every time.  If the file was modified (e.g. saved from
+    the editor) it is rewritten from the full history, so edits are
+    discarded just like with a fresh temporary file.
+
+    """
+    def __init__(self, filename=None):
+        # When no filename is given, a temporary file is created on the
+        # first sync.
+        self.filename = filename
+        self._num_synced = 0
+        self._synced_stat = None
+
+    def sync(self, history):
+        """Bring the file up to date with the history.
+
+        :type history: list
+        :param history: The full command history.
+
+        """
+        mode = 'a'
+        if self.filename is None or (
+                self._synced_stat is not None and
+                self._get_stat() is None):
+            self._create_file()
+            self._num_synced = 0
+        elif self._get_stat() != self._synced_stat:
+            mode = 'w'
+            self._num_synced = 0
+        new_entries = history[self._num_synced:]
+        # Skip empty entries along with dot and shell commands.
+        commands = [h for h in new_entries if h and h[0] not in '.!']
+        # The file is reopened on every sync rather than kept open since
+        # editors commonly replace the file when saving it.
+        with open(self.filename, mode) as f:
+            f.writelines(command + '\n' for command in commands)
+        self._num_synced += len(new_entries)
+        self._synced_stat = self._get_stat()
+
+    def _create_file(self):
+        # The history can include secrets passed as arguments, mkstemp
+        # creates the file readable only by the user and refuses to
+        # reuse an existing file.
+        fd, self.filename = tempfile.mkstemp(prefix='awsshell-edit-')
+        os.close(fd)
+
+    def _get_stat(self):
+        try:
+            stat = os.stat(self.filename)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_size, stat.st_mtime)
+
+    def remove(self):
+        if self.filename is None:
+            return
+        try:
+            os.remove(self.filename)
+        except OSError:
+            pass
+
+
 class EditHandler(object):
     def __init__(self, popen_cls=None, env=None, err=sys.stderr):
         if popen_cls is None:
@@ -80,11 +143,6 @@ class EditHandler(object):
         else:
             return compat.default_editor()
 
-    def _generate_edit_history(self, application):
-        history = list(application.history)
-        commands = [h for h in history if not h.startswith(('.', '!'))]
-        return '\n'.join(commands)
-
     def run(self, command, application):
         """Open application's history buffer in an editor.
 
@@ -96,19 +154,17 @@ class EditHandler(object):
         :param application: The application object.
 
         """
-        with temporary_file('w') as f:
-            all_commands = self._generate_edit_history(application)
-            f.write(all_commands)
-            f.flush()
-            editor = self._get_editor_command()
-            try:
-                p = self._popen_cls([editor, f.name])
-                p.communicate()
-            except OSError:
-                self._err.write("Unable to launch editor: %s\n"
-                                "You can configure which editor to use by "
-                                "exporting the EDITOR environment variable.\n"
-                                % editor)
+        edit_history_file = application.edit_history_file
+        edit_history_file.sync(application.history)
+        editor = self._get_editor_command()
+        try:
+            p = self._popen_cls([editor, edit_history_file.filename])
+            p.communicate()
+        except OSError:
+            self._err.write("Unable to launch editor: %s\n"
+                            "You can configure which editor to use by "
+                            "exporting the EDITOR environment variable.\n"
+                            % editor)
 
 
 class ProfileHandler(object):
@@ -194,9 +250,6 @@ class AWSShell(object):
     Runs the input event loop and delegates the command execution to either
     the `awscli` or the underlying shell.
 
-    :type refresh_cli: bool
-    :param refresh_cli: Flag to refresh the cli.
-
     :type config_obj: :class:`configobj.ConfigObj`
     :param config_obj: Contains the config information for reading and writing.
 
@@ -229,11 +282,12 @@ class AWSShell(object):
         self.completer = completer
         self.model_completer = model_completer
         self.history = InMemoryHistory()
+        self.edit_history_file = EditHistoryFile()
         self.file_history = FileHistory(build_config_file_path('history'))
         self._cli = None
         self._docs = docs
         self.current_docs = u''
-        self.refresh_cli = False
+        self._last_docs_key = None
         self.key_manager = None
         self._dot_cmd = DotCommandHandler()
         self._env = os.environ.copy()
@@ -241,8 +295,8 @@ class AWSShell(object):
         self._input = input
         self._output = output
 
-        if popen_cls is None:
-            popen_cls = subprocess.Popen
+        # When no popen_cls is given, commands are launched with
+        # posix_spawn where the platform supports it.
         self._popen_cls = popen_cls
 
         # These attrs come from the config file.
@@ -253,6 +307,17 @@ class AWSShell(object):
         self.show_help = None
         self.theme = None
 
+        # Getters for the toolbar options, shared by the key manager and
+        # the toolbar.  The options are plain attributes, so these need to
+        # be callables that read them when a key is pressed or the toolbar
+        # is drawn.
+        self._option_getters = (
+            lambda: self.model_completer.match_fuzzy,
+            lambda: self.enable_vi_bindings,
+            lambda: self.show_completion_columns,
+            lambda: self.show_help,
+        )
+
         self.load_config()
 
     def load_config(self):
@@ -270,33 +335,82 @@ class AWSShell(object):
         self.theme = self.config_section['theme']
 
     def save_config(self):
-        """Save the config to the config file."""
-        self.config_section['match_fuzzy'] = self.model_completer.match_fuzzy
-        self.config_section['enable_vi_bindings'] = self.enable_vi_bindings
-        self.config_section['show_completion_columns'] = \
-            self.show_completion_columns
-        self.config_section['show_help'] = self.show_help
-        self.config_section['theme'] = self.theme
-        self.config_obj.write()
+        """Save the config to the config file.
+
+        The config file is only written if one of the options changed,
+        and is written to a temporary file first which then replaces
+        the config file, so the config is never left half written.
+
+        """
+        options = {
+            'match_fuzzy': self.model_completer.match_fuzzy,
+            'enable_vi_bindings': self.enable_vi_bindings,
+            'show_completion_columns': self.show_completion_columns,
+            'show_help': self.show_help,
+            'theme': self.theme,
+        }
+        if not self._config_changed(options):
+            return
+        previous = dict((name, self.config_section.get(name))
+                        for name in options)
+        self.config_section.update(options)
+        filename = self.config_obj.filename
+        temp_filename = filename + '.tmp'
+        try:
+            with open(temp_filename, 'wb') as f:
+                self.config_obj.write(f)
+            if os.path.exists(filename):
+                shutil.copymode(filename, temp_filename)
+            compat.replace_file(temp_filename, filename)
+        except Exception:
+            # Put the section back so a later save retries the write.
+            self.config_section.update(previous)
+            try:
+                os.remove(temp_filename)
+            except OSError:
+                pass
+            raise
+
+    def _config_changed(self, options):
+        for name, value in options.items():
+            try:
+                if isinstance(value, bool):
+                    current = self.config_section.as_bool(name)
+                else:
+                    current = self.config_section[name]
+            except (KeyError, ValueError):
+                return True
+            if current != value:
+                return True
+        return False
 
     @property
     def cli(self):
-        if self._cli is None or self.refresh_cli:
-            self._cli = self.create_cli_interface(self.show_completion_columns)
-            self.refresh_cli = False
+        if self._cli is None:
+            # The column layout is driven by a filter rather than a plain
+            # bool so toggling it doesn't require rebuilding the cli.
+            self._cli = self.create_cli_interface(
+                Condition(lambda cli: self.show_completion_columns))
         return self._cli
 
     def run(self):
+        try:
+            self._run_commands()
+        finally:
+            self.edit_history_file.remove()
+
+    def _run_commands(self):
         while True:
             try:
                 document = self.cli.run(reset_current_buffer=True)
                 text = document.text
-            except InputInterrupt:
-                pass
             except (KeyboardInterrupt, EOFError):
                 self.save_config()
                 break
             else:
+                if not text.strip():
+                    # Nothing to run, don't launch a bare ``aws``.
+                    continue
                 if text.startswith('.'):
                     # These are special commands (dot commands) that are
                     # interpreted by the aws-shell directly and typically used
@@ -311,32 +425,66 @@ class AWSShell(object):
                     else:
                         full_cmd = 'aws ' + text
                         self.history.append(full_cmd)
-                    self.current_docs = u''
-                    self.cli.buffers['clidocs'].reset(
-                        initial_document=Document(self.current_docs,
-                                                  cursor_position=0))
-                    self.cli.request_redraw()
-                    p = self._popen_cls(full_cmd, shell=True, env=self._env)
-                    p.communicate()
+                    self._last_docs_key = None
+                    self._display_docs(self.cli, u'')
+                    self._spawn_and_wait(full_cmd)
+
+    def _spawn_and_wait(self, command):
+        """Run a command through the shell and wait for it to exit.
+
+        Commands always go through the shell so pipes, redirection and
+        variable expansion keep working.  ``posix_spawn`` is used to
+        launch ``/bin/sh`` when available since it avoids copying the
+        shell's (fairly large) address space the way ``fork`` does.
+        On other platforms, or when a ``popen_cls`` was provided, we
+        fall back to ``subprocess.Popen``.
+
+        :type command: str
+        :param command: The command line to run.
 
-    def stop_input_and_refresh_cli(self):
-        """Stop input by raising an `InputInterrupt`, forces a cli refresh.
+        """
+        try:
+            if self._popen_cls is None and hasattr(os, 'posix_spawnp'):
+                argv = ['/bin/sh', '-c', command]
+                # Python ignores SIGPIPE and SIGXFSZ, restore their
+                # defaults in the child like Popen's restore_signals does
+                # so pipelines such as ``| head`` behave normally.
+                pid = os.posix_spawnp(argv[0], argv, self._env,
+                                      setsigdef=_RESTORED_SIGNALS)
+                os.waitpid(pid, 0)
+            else:
+                popen_cls = self._popen_cls or subprocess.Popen
+                p = popen_cls(command, shell=True, env=self._env,
+                              close_fds=True)
+                p.communicate()
+        except OSError as e:
+            sys.stderr.write("Unable to run command: %s\n" % e)
 
-        The cli refresh is necessary because changing options such as key
-        bindings, single vs multi column menu completions, and the help pane
-        all require a rebuild.
+    def refresh_cli(self):
+        """Apply the current toolbar options to the cli and redraw it.
 
-        :raises: :class:`InputInterrupt <exceptions.InputInterrupt>`.
+        The layout reads the completion columns option through a filter,
+        the editing mode is pushed to the running cli, and the docs are
+        cleared when the help pane is turned off.
 
         """
-        self.refresh_cli = True
+        self.cli.editing_mode = self._get_editing_mode()
+        if not self.show_help:
+            # Forget the last docs lookup so turning help back on shows
+            # the docs for the current command again.
+            self._last_docs_key = None
+            self._display_docs(self.cli, u'')
         self.cli.request_redraw()
-        raise InputInterrupt
+
+    def _get_editing_mode(self):
+        if self.enable_vi_bindings:
+            return EditingMode.VI
+        return EditingMode.EMACS
 
     def create_layout(self, display_completions_in_columns, toolbar):
         from awsshell.lexer import ShellLexer
         lexer = ShellLexer
-        if self.config_section['theme'] == 'none':
+        if self.theme == 'none':
             lexer = None
         return create_default_layout(
             self, u'aws> ', lexer=lexer, reserve_space_for_menu=True,
@@ -361,8 +509,8 @@ class AWSShell(object):
 
         :rtype: :class:`KeyManager`
         :return: A KeyManager with callables to set the toolbar options.  Also
-            includes the method stop_input_and_refresh_cli to ensure certain
-            options take effect within the current session.
+            includes the method refresh_cli to ensure certain options take
+            effect within the current session.
 
         """
         def set_match_fuzzy(match_fuzzy):
@@ -405,33 +553,26 @@ class AWSShell(object):
             """
             self.show_help = show_help
 
+        get_match_fuzzy, get_enable_vi_bindings, \
+            get_show_completion_columns, get_show_help = self._option_getters
         return KeyManager(
-            lambda: self.model_completer.match_fuzzy, set_match_fuzzy,
-            lambda: self.enable_vi_bindings, set_enable_vi_bindings,
-            lambda: self.show_completion_columns, set_show_completion_columns,
-            lambda: self.show_help, set_show_help,
-            self.stop_input_and_refresh_cli)
+            get_match_fuzzy, set_match_fuzzy,
+            get_enable_vi_bindings, set_enable_vi_bindings,
+            get_show_completion_columns, set_show_completion_columns,
+            get_show_help, set_show_help,
+            self.refresh_cli)
 
     def create_application(self, completer, history,
                            display_completions_in_columns):
         self.key_manager = self.create_key_manager()
-        toolbar = Toolbar(
-            lambda: self.model_completer.match_fuzzy,
-            lambda: self.enable_vi_bindings,
-            lambda: self.show_completion_columns,
-            lambda: self.show_help)
+        toolbar = Toolbar(*self._option_getters)
         style_factory = StyleFactory(self.theme)
         buffers = {
             'clidocs': Buffer(read_only=True)
         }
 
-        if self.enable_vi_bindings:
-            editing_mode = EditingMode.VI
-        else:
-            editing_mode = EditingMode.EMACS
-
         return Application(
-            editing_mode=editing_mode,
+            editing_mode=self._get_editing_mode(),
             layout=self.create_layout(display_completions_in_columns, toolbar),
             mouse_support=False,
             style=style_factory.style,
@@ -449,30 +590,53 @@ class AWSShell(object):
         document = cli.current_buffer.document
         text = document.text
         LOG.debug("document.text = %s", text)
-        LOG.debug("current_command = %s", self.completer.current_command)
         if text.strip():
-            command = self.completer.current_command
-            key_name = '.'.join(command.split()).encode('utf-8')
-            last_option = self.completer.last_option
+            key_name = self.completer.current_command_key
+            LOG.debug("current_command_key = %s", key_name)
+            docs_key = (key_name, self.completer.last_option)
+        else:
+            docs_key = None
+        # Input timeouts fire on every pause in typing, but the docs
+        # only change when the command or option being typed changes.
+        if docs_key == self._last_docs_key:
+            return
+        self._last_docs_key = docs_key
+        if docs_key is None:
+            self._display_docs(cli, u'')
+            return
+
+        def lookup_docs():
+            # Runs in a background thread so a doc lookup never blocks
+            # input, the result is handed back to the event loop.
+            key_name, last_option = docs_key
             if last_option:
-                self.current_docs = self._docs.extract_param(
-                    key_name, last_option)
+                docs = self._docs.extract_param(key_name, last_option)
             else:
-                self.current_docs = self._docs.extract_description(key_name)
-        else:
-            self.current_docs = u''
-
-        position = cli.buffers['clidocs'].document.cursor_position
-        # if the docs to be displayed have changed, reset position to 0
-        if cli.buffers['clidocs'].text != self.current_docs:
-            position = 0
-
-        cli.buffers['clidocs'].reset(
-            initial_document=Document(
-                self.current_docs,
-                cursor_position=position
-            )
-        )
+                docs = self._docs.extract_description(key_name)
+            # Missing docs may still be getting generated in the
+            # background, those are looked up again on the next timeout.
+            retry = not docs and not self._docs.index_complete()
+            cli.eventloop.call_from_executor(
+                lambda: self._on_docs_looked_up(cli, docs_key, docs, retry))
+
+        cli.eventloop.run_in_executor(lookup_docs)
+
+    def _on_docs_looked_up(self, cli, docs_key, docs, retry=False):
+        # Drop results for a command the user has already moved past.
+        if docs_key != self._last_docs_key:
+            return
+        if retry:
+            self._last_docs_key = None
+        self._display_docs(cli, docs)
+
+    def _display_docs(self, cli, docs):
+        self.current_docs = docs
+        clidocs = cli.buffers['clidocs']
+        # Resetting the buffer and redrawing is only needed when the docs
+        # changed, this also keeps the cursor position in the docs pane.
+        if clidocs.text == docs:
+            return
+        clidocs.reset(initial_document=Document(docs, cursor_position=0))
         cli.request_redraw()
 
     def create_cli_interface(self, display_completions_in_columns):
@@ -1,4 +1,5 @@
 from __future__ import print_function
+import os
 import sys
 import platform
 
@@ -12,12 +13,19 @@ if PY3:
     text_type = str
     from io import StringIO
     import dbm
+    replace_file = os.replace
 else:
     from HTMLParser import HTMLParser
     text_type = unicode
     from cStringIO import StringIO
     import anydbm as dbm
 
+    def replace_file(src, dst):
+        # os.rename can't overwrite an existing file on windows.
+        if ON_WINDOWS and os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
 
 if ON_WINDOWS:
     def default_editor():
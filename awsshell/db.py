@@ -1,6 +1,7 @@
 from __future__ import unicode_literals
 import os
 import sqlite3
+import threading
 
 
 class ConcurrentDBM(object):
@@ -10,12 +11,12 @@ class ConcurrentDBM(object):
         if create and not os.path.isfile(filename):
             return cls.create(filename)
         else:
-            db = sqlite3.connect(filename)
+            db = sqlite3.connect(filename, check_same_thread=False)
             return cls(db)
 
     @classmethod
     def create(cls, filename):
-        db = sqlite3.connect(filename)
+        db = sqlite3.connect(filename, check_same_thread=False)
         with db:
             db.execute(
                 'CREATE TABLE docindex (key TEXT PRIMARY KEY, value TEXT)')
@@ -23,24 +24,29 @@ class ConcurrentDBM(object):
 
     def __init__(self, db):
         self._db = db
+        # The connection can be shared across threads (e.g. docs are
+        # looked up in the background), so serialize access to it.
+        self._lock = threading.Lock()
 
     def __getitem__(self, key):
         if isinstance(key, bytes):
             key = key.decode('utf-8')
-        cursor = self._db.cursor()
-        cursor.execute(
-            'SELECT value FROM docindex WHERE key = :key', {'key': key})
-        result = cursor.fetchone()
+        with self._lock:
+            cursor = self._db.cursor()
+            cursor.execute(
+                'SELECT value FROM docindex WHERE key = :key', {'key': key})
+            result = cursor.fetchone()
         if result is not None:
             return result[0]
         raise KeyError(key)
 
     def __setitem__(self, key, value):
-        with self._db:
-            self._db.execute(
-                'INSERT OR REPLACE INTO docindex (key, value) '
-                'VALUES (:key, :value)',
-                {'key': key, 'value': value})
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    'INSERT OR REPLACE INTO docindex (key, value) '
+                    'VALUES (:key, :value)',
+                    {'key': key, 'value': value})
 
     def close(self):
         self._db.close()
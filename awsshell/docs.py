@@ -14,24 +14,52 @@ def load_doc_db(filename):
 
 class DocRetriever(object):
     """Retrieve documentation for the AWS CLI."""
+
+    MAX_CACHE_SIZE = 512
+
     def __init__(self, doc_index):
         # Internally, most of the speedup comes from
         # the fact that this data is pre-rendered and
         # indexed.
         self._doc_index = doc_index
         self._cache = {}
+        self._index_complete = False
+
+    def index_complete(self):
+        """Return whether the doc index has finished being generated."""
+        if not self._index_complete:
+            try:
+                self._doc_index['__complete__']
+                self._index_complete = True
+            except KeyError:
+                pass
+        return self._index_complete
+
+    def _cache_docs(self, cache_key, docs):
+        if len(self._cache) >= self.MAX_CACHE_SIZE:
+            # Evict the oldest entry (an arbitrary one on python2).
+            del self._cache[next(iter(self._cache))]
+        self._cache[cache_key] = docs
 
     def extract_description(self, dot_cmd):
+        cache_key = (dot_cmd, None)
+        if cache_key in self._cache:
+            return self._cache[cache_key]
         try:
             docs = self._doc_index[dot_cmd]
         except KeyError:
+            # Not cached, the doc index may still be getting generated.
             return u''
         index = docs.find('SYNOPSIS')
         if index > 0:
             docs = docs[:index]
+        self._cache_docs(cache_key, docs)
         return docs
 
     def extract_param(self, dot_cmd, param_name):
+        cache_key = (dot_cmd, param_name)
+        if cache_key in self._cache:
+            return self._cache[cache_key]
         try:
             docs = self._doc_index[dot_cmd]
         except KeyError:
@@ -39,4 +67,6 @@ class DocRetriever(object):
         index = docs.find('OPTIONS')
         param_start_index = docs.find(param_name, index)
         param_end_index = docs.find('--', param_start_index + 1)
-        return docs[param_start_index:param_end_index]
+        docs = docs[param_start_index:param_end_index]
+        self._cache_docs(cache_key, docs)
+        return docs
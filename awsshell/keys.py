@@ -30,20 +30,19 @@ class KeyManager(object):
     def __init__(self, get_match_fuzzy, set_match_fuzzy,
                  get_enable_vi_bindings, set_enable_vi_bindings,
                  get_show_completion_columns, set_show_completion_columns,
-                 get_show_help, set_show_help, stop_input_and_refresh_cli):
+                 get_show_help, set_show_help, refresh_cli):
         self.manager = None
         self._create_key_manager(
             get_match_fuzzy, set_match_fuzzy,
             get_enable_vi_bindings, set_enable_vi_bindings,
             get_show_completion_columns, set_show_completion_columns,
-            get_show_help, set_show_help, stop_input_and_refresh_cli)
+            get_show_help, set_show_help, refresh_cli)
 
     def _create_key_manager(self, get_match_fuzzy, set_match_fuzzy,
                             get_enable_vi_bindings, set_enable_vi_bindings,
                             get_show_completion_columns,
                             set_show_completion_columns,
-                            get_show_help, set_show_help,
-                            stop_input_and_refresh_cli):
+                            get_show_help, set_show_help, refresh_cli):
         """Create and initialize the keybinding manager.
 
         :type get_fuzzy_match: callable
@@ -74,10 +73,9 @@ class KeyManager(object):
         :type set_show_help: callable
         :param set_show_help: Sets the show help pane config.
 
-        :type stop_input_and_refresh_cli: callable
-        param stop_input_and_refresh_cli: Stops input by raising an
-            `InputInterrupt`, forces a cli refresh to ensure certain
-            options take effect within the current session.
+        :type refresh_cli: callable
+        :param refresh_cli: Applies the toggled options to the running cli
+            and redraws it, so they take effect within the current session.
 
         :rtype: :class:`prompt_toolkit.KeyBindingManager`
         :return: A custom `KeyBindingManager`.
@@ -91,7 +89,7 @@ class KeyManager(object):
         assert callable(set_show_completion_columns)
         assert callable(get_show_help)
         assert callable(set_show_help)
-        assert callable(stop_input_and_refresh_cli)
+        assert callable(refresh_cli)
         self.manager = KeyBindingManager(
             enable_search=True,
             enable_abort_and_exit_bindings=True,
@@ -120,7 +118,7 @@ class KeyManager(object):
 
             """
             set_enable_vi_bindings(not get_enable_vi_bindings())
-            stop_input_and_refresh_cli()
+            refresh_cli()
 
         @self.manager.registry.add_binding(Keys.F4)
         def handle_f4(_):
@@ -131,7 +129,7 @@ class KeyManager(object):
 
             """
             set_show_completion_columns(not get_show_completion_columns())
-            stop_input_and_refresh_cli()
+            refresh_cli()
 
         @self.manager.registry.add_binding(Keys.F5)
         def handle_f5(_):
@@ -142,7 +140,7 @@ class KeyManager(object):
 
             """
             set_show_help(not get_show_help())
-            stop_input_and_refresh_cli()
+            refresh_cli()
 
         @self.manager.registry.add_binding(Keys.F9)
         def handle_f9(event):
@@ -34,6 +34,8 @@ class AWSShellCompleter(Completer):
         if server_side_completer is None:
             server_side_completer = self._create_server_side_completer()
         self._server_side_completer = server_side_completer
+        self._key_cmd_path = None
+        self._current_command_key = None
 
     def _create_server_side_completer(self, session=None):
         from awsshell.resource import index
@@ -71,6 +73,20 @@ class AWSShellCompleter(Completer):
     def current_command(self):
         return u' '.join(self._completer.cmd_path)
 
+    @property
+    def current_command_key(self):
+        """The current command as the key used to look up its docs.
+
+        This is checked on every input timeout, so the encoded key is
+        cached until the command path changes.
+
+        """
+        cmd_path = self._completer.cmd_path
+        if cmd_path != self._key_cmd_path:
+            self._key_cmd_path = list(cmd_path)
+            self._current_command_key = u'.'.join(cmd_path).encode('utf-8')
+        return self._current_command_key
+
     def _convert_to_prompt_completions(self, low_level_completions,
                                        text_before_cursor):
         # Converts the low level completions from the model autocompleter
@@ -56,3 +56,43 @@ class ConfigTest(unittest.TestCase):
             'show_completion_columns') == True
         assert self.aws_shell.config_section.as_bool('show_help') == True
         assert self.aws_shell.config_section['theme'] == 'vim'
+
+    def test_config_not_written_when_unchanged(self):
+        self.aws_shell = AWSShell(None, mock.Mock(), mock.Mock())
+        self.aws_shell.config_obj.write = mock.Mock()
+        self.aws_shell.save_config()
+        assert not self.aws_shell.config_obj.write.called
+        # Only the unchanged save is skipped, a changed option is written.
+        del self.aws_shell.config_obj.write
+        show_help = self.aws_shell.show_help
+        self.aws_shell.show_help = not show_help
+        self.aws_shell.save_config()
+        self.aws_shell.load_config()
+        assert self.aws_shell.show_help == (not show_help)
+        self.aws_shell.show_help = show_help
+        self.aws_shell.save_config()
+
+    def test_config_write_keeps_mode_and_cleans_up_on_error(self):
+        self.aws_shell = AWSShell(None, mock.Mock(), mock.Mock())
+        filename = self.aws_shell.config_obj.filename
+        temp_filename = filename + '.tmp'
+        show_help = self.aws_shell.show_help
+        os.chmod(filename, 0o600)
+        try:
+            self.aws_shell.show_help = not show_help
+            self.aws_shell.save_config()
+            if os.name != 'nt':
+                assert os.stat(filename).st_mode & 0o777 == 0o600
+
+            self.aws_shell.show_help = show_help
+            with mock.patch('awsshell.compat.replace_file',
+                            side_effect=OSError()):
+                with self.assertRaises(OSError):
+                    self.aws_shell.save_config()
+            assert not os.path.exists(temp_filename)
+            # The failed write is retried by the next save.
+            self.aws_shell.save_config()
+            self.aws_shell.load_config()
+            assert self.aws_shell.show_help == show_help
+        finally:
+            os.chmod(filename, 0o644)
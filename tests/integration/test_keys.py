@@ -18,7 +18,8 @@ from prompt_toolkit.key_binding.input_processor import KeyPress
 from prompt_toolkit.keys import Keys
 
 from tests.compat import unittest
-from awsshell.app import AWSShell, InputInterrupt
+from awsshell.app import AWSShell
+from awsshell.ui import HasDocumentation
 
 
 class KeysTest(unittest.TestCase):
@@ -44,23 +45,33 @@ class KeysTest(unittest.TestCase):
 
     def test_F3(self):
         enable_vi_bindings = self.aws_shell.enable_vi_bindings
-        with self.assertRaises(InputInterrupt):
-            self.feed_key(Keys.F3)
+        cli = self.aws_shell.cli
+        self.feed_key(Keys.F3)
         assert enable_vi_bindings != self.aws_shell.enable_vi_bindings
+        assert cli is self.aws_shell.cli
+        assert cli.editing_mode == self.aws_shell._get_editing_mode()
 
     def test_F4(self):
         show_completion_columns = self.aws_shell.show_completion_columns
-        with self.assertRaises(InputInterrupt):
-            self.feed_key(Keys.F4)
+        self.feed_key(Keys.F4)
         assert show_completion_columns != \
             self.aws_shell.show_completion_columns
 
     def test_F5(self):
         show_help = self.aws_shell.show_help
-        with self.assertRaises(InputInterrupt):
-            self.feed_key(Keys.F5)
+        self.feed_key(Keys.F5)
         assert show_help != self.aws_shell.show_help
 
+    def test_F5_hides_docs(self):
+        self.aws_shell.show_help = True
+        self.aws_shell._display_docs(self.aws_shell.cli, u'some docs')
+        self.feed_key(Keys.F5)
+        assert not self.aws_shell.show_help
+        assert self.aws_shell.current_docs == u''
+        assert self.aws_shell.cli.buffers['clidocs'].text == u''
+        has_docs = HasDocumentation(self.aws_shell)
+        assert not has_docs(self.aws_shell.cli)
+
     def test_F9(self):
         assert self.aws_shell.cli.current_buffer_name == u'DEFAULT_BUFFER'
         self.feed_key(Keys.F9)
@@ -1,3 +1,5 @@
+import os
+
 import pytest
 import mock
 
@@ -35,7 +37,7 @@ class PopenLogger(object):
         return mock.Mock()
 
 
-def test_edit_handler():
+def test_edit_handler(tmpdir):
     env = {'EDITOR': 'my-editor'}
     popen_cls = mock.Mock()
     application = mock.Mock()
@@ -45,24 +47,81 @@ def test_edit_handler():
         'aws ec2 describe-instances',
         'aws ec2 allocate-hosts',
     ]
+    application.edit_history_file = app.EditHistoryFile(
+        tmpdir.join('edit-history').strpath)
     popen = PopenLogger()
     handler = app.EditHandler(popen, env)
     handler.run(['.edit'], application)
-    # Ensure our editor was called with some arbitrary temp filename.
+    # Ensure our editor was called with the edit history file.
     command_run = popen.cmd
     assert len(command_run) == 2
     assert command_run[0] == 'my-editor'
-    # Ensure the contents of the temp file are correct
-    expected_contents = 'aws ec2 describe-instances\naws ec2 allocate-hosts'
+    assert command_run[1] == application.edit_history_file.filename
+    # Ensure the contents of the file are correct
+    expected_contents = (
+        'aws ec2 describe-instances\naws ec2 allocate-hosts\n')
     assert popen.contents == expected_contents
 
 
-def test_error_msg_printed_on_error_handler(errstream):
+def test_edit_handler_only_appends_new_history(tmpdir):
+    env = {'EDITOR': 'my-editor'}
+    application = mock.Mock()
+    application.history = ['aws ec2 describe-instances']
+    application.edit_history_file = app.EditHistoryFile(
+        tmpdir.join('edit-history').strpath)
+    popen = PopenLogger()
+    handler = app.EditHandler(popen, env)
+    handler.run(['.edit'], application)
+    application.history.append('aws s3 ls')
+    handler.run(['.edit'], application)
+    assert popen.contents == 'aws ec2 describe-instances\naws s3 ls\n'
+
+
+class EditingPopen(PopenLogger):
+    def __call__(self, cmd):
+        result = super(EditingPopen, self).__call__(cmd)
+        with open(cmd[1], 'a') as f:
+            f.write('aws my edits\n')
+        return result
+
+
+def test_edit_handler_discards_edits_from_editor(tmpdir):
+    env = {'EDITOR': 'my-editor'}
+    application = mock.Mock()
+    application.history = ['aws ec2 describe-instances']
+    application.edit_history_file = app.EditHistoryFile(
+        tmpdir.join('edit-history').strpath)
+    popen = EditingPopen()
+    handler = app.EditHandler(popen, env)
+    handler.run(['.edit'], application)
+    application.history.append('aws s3 ls')
+    handler.run(['.edit'], application)
+    assert popen.contents == 'aws ec2 describe-instances\naws s3 ls\n'
+
+
+def test_edit_history_file_recreated_if_deleted():
+    edit_history_file = app.EditHistoryFile()
+    try:
+        edit_history_file.sync(['aws ec2 describe-instances'])
+        os.remove(edit_history_file.filename)
+        edit_history_file.sync(['aws ec2 describe-instances', 'aws s3 ls'])
+        if not compat.ON_WINDOWS:
+            mode = os.stat(edit_history_file.filename).st_mode
+            assert mode & 0o777 == 0o600
+        with open(edit_history_file.filename) as f:
+            assert f.read() == 'aws ec2 describe-instances\naws s3 ls\n'
+    finally:
+        edit_history_file.remove()
+
+
+def test_error_msg_printed_on_error_handler(errstream, tmpdir):
     env = {'EDITOR': 'my-editor'}
     popen_cls = mock.Mock()
     popen_cls.side_effect = OSError()
     context = mock.Mock()
     context.history = []
+    context.edit_history_file = app.EditHistoryFile(
+        tmpdir.join('edit-history').strpath)
     handler = app.EditHandler(popen_cls, env, errstream)
     handler.run(['.edit'], context)
 
@@ -169,6 +228,88 @@ def test_history_stored_correctly():
     assert list(shell.history) == ['aws ec2 describe-instances']
 
 
+def test_empty_input_is_not_run():
+    mock_prompter = mock.Mock()
+    mock_prompter.buffers = {'clidocs': mock.Mock()}
+    quit_document = mock.Mock()
+    quit_document.text = '.quit'
+    empty_document = mock.Mock()
+    empty_document.text = '   '
+    mock_prompter.run.side_effect = [empty_document, quit_document]
+    popen_cls = mock.Mock()
+    shell = app.AWSShell(mock.Mock(), mock.Mock(), mock.Mock(),
+                         popen_cls=popen_cls)
+    shell.create_cli_interface = mock.Mock(return_value=mock_prompter)
+    shell.run()
+
+    assert not popen_cls.called
+    assert list(shell.history) == []
+
+
+def run_shell_with_commands(popen_cls, *texts):
+    mock_prompter = mock.Mock()
+    mock_prompter.buffers = {'clidocs': mock.Mock()}
+    documents = []
+    for text in texts + ('.quit',):
+        document = mock.Mock()
+        document.text = text
+        documents.append(document)
+    mock_prompter.run.side_effect = documents
+    shell = app.AWSShell(mock.Mock(), mock.Mock(), mock.Mock(),
+                         popen_cls=popen_cls)
+    shell.create_cli_interface = mock.Mock(return_value=mock_prompter)
+    shell.run()
+    return shell
+
+
+def test_commands_run_through_shell():
+    popen_cls = mock.Mock()
+    run_shell_with_commands(
+        popen_cls, 'ec2 describe-instances --filters "Name=a,Values=b"',
+        '!ls -l | wc', 's3 ls | head > out.txt')
+
+    aws_call, shell_call, pipe_call = popen_cls.call_args_list
+    assert aws_call[0] == (
+        'aws ec2 describe-instances --filters "Name=a,Values=b"',)
+    assert aws_call[1]['shell'] is True
+    assert aws_call[1]['close_fds'] is True
+    assert shell_call[0] == ('ls -l | wc',)
+    assert shell_call[1]['shell'] is True
+    # Pipes and redirection in aws commands are left to the shell.
+    assert pipe_call[0] == ('aws s3 ls | head > out.txt',)
+    assert pipe_call[1]['shell'] is True
+
+
+@pytest.mark.skipif(not hasattr(os, 'posix_spawnp'),
+                    reason='posix_spawnp is not available')
+def test_commands_spawned_with_posix_spawn():
+    with mock.patch('os.posix_spawnp') as posix_spawnp, \
+            mock.patch('os.waitpid') as waitpid:
+        posix_spawnp.return_value = 1234
+        shell = run_shell_with_commands(
+            None, 's3 ls', '!echo $HOME')
+
+    aws_call, shell_call = posix_spawnp.call_args_list
+    assert aws_call[0] == (
+        '/bin/sh', ['/bin/sh', '-c', 'aws s3 ls'], shell._env)
+    assert shell_call[0] == (
+        '/bin/sh', ['/bin/sh', '-c', 'echo $HOME'], shell._env)
+    assert waitpid.call_args_list == [mock.call(1234, 0)] * 2
+    assert aws_call[1]['setsigdef'] == app._RESTORED_SIGNALS
+
+
+@pytest.mark.skipif(not hasattr(os, 'posix_spawnp'),
+                    reason='posix_spawnp is not available')
+def test_spawned_commands_do_not_ignore_sigpipe(tmpdir):
+    errfile = tmpdir.join('err').strpath
+    shell = app.AWSShell(mock.Mock(), mock.Mock(), mock.Mock())
+    # With SIGPIPE ignored, yes would report a broken pipe on stderr
+    # instead of being silently killed once head exits.
+    shell._spawn_and_wait('(yes | head -n 1) > /dev/null 2> %s' % errfile)
+    with open(errfile) as f:
+        assert f.read() == ''
+
+
 def test_exit_dot_command_exits_shell():
     mock_prompter = mock.Mock()
     # Simulate the user entering '.quit'
@@ -183,3 +324,147 @@ def test_exit_dot_command_exits_shell():
     # see the .quit command, we immediately exit and stop prompting
     # for more shell commands.
     assert mock_prompter.run.call_count == 1
+
+
+class ImmediateEventLoop(object):
+    def run_in_executor(self, callback):
+        callback()
+
+    def call_from_executor(self, callback):
+        callback()
+
+
+def test_input_timeout_only_looks_up_docs_when_command_changes():
+    docs = mock.Mock()
+    docs.extract_description.return_value = 'describe-instances docs'
+    docs.extract_param.return_value = '--instance-ids docs'
+    completer = mock.Mock()
+    completer.current_command_key = b'ec2.describe-instances'
+    completer.last_option = ''
+    shell = app.AWSShell(completer, mock.Mock(), docs)
+    shell.show_help = True
+    cli = mock.Mock()
+    cli.buffers = {'clidocs': mock.Mock()}
+    cli.eventloop = ImmediateEventLoop()
+    cli.current_buffer.document.text = 'ec2 describe-instances'
+
+    shell.on_input_timeout(cli)
+    shell.on_input_timeout(cli)
+    assert docs.extract_description.call_count == 1
+    assert shell.current_docs == 'describe-instances docs'
+
+    completer.last_option = '--instance-ids'
+    shell.on_input_timeout(cli)
+    assert docs.extract_param.call_args == mock.call(
+        b'ec2.describe-instances', '--instance-ids')
+    assert shell.current_docs == '--instance-ids docs'
+
+
+def test_stale_doc_lookups_are_ignored():
+    docs = mock.Mock()
+    completer = mock.Mock()
+    completer.last_option = ''
+    shell = app.AWSShell(completer, mock.Mock(), docs)
+    shell.show_help = True
+    pending = []
+    cli = mock.Mock()
+    cli.buffers = {'clidocs': mock.Mock()}
+    cli.eventloop.run_in_executor.side_effect = pending.append
+    cli.eventloop.call_from_executor.side_effect = lambda f: f()
+    cli.current_buffer.document.text = 'ec2'
+
+    completer.current_command_key = b'ec2'
+    shell.on_input_timeout(cli)
+    completer.current_command_key = b's3'
+    shell.on_input_timeout(cli)
+
+    # The lookup for 's3' finishes first, then the stale 'ec2' lookup.
+    docs.extract_description.return_value = 's3 docs'
+    pending[1]()
+    docs.extract_description.return_value = 'ec2 docs'
+    pending[0]()
+    assert shell.current_docs == 's3 docs'
+
+
+def test_docs_buffer_not_reset_when_docs_unchanged():
+    docs = mock.Mock()
+    docs.extract_description.return_value = 'ec2 docs'
+    completer = mock.Mock()
+    completer.last_option = ''
+    shell = app.AWSShell(completer, mock.Mock(), docs)
+    shell.show_help = True
+    cli = mock.Mock()
+    cli.buffers = {'clidocs': mock.Mock(text='ec2 docs')}
+    cli.eventloop = ImmediateEventLoop()
+    cli.current_buffer.document.text = 'ec2'
+    completer.current_command_key = b'aws.ec2'
+
+    shell.on_input_timeout(cli)
+    assert shell.current_docs == 'ec2 docs'
+    assert not cli.buffers['clidocs'].reset.called
+    assert not cli.request_redraw.called
+
+
+def test_missing_docs_are_looked_up_again_while_index_incomplete():
+    docs = mock.Mock()
+    docs.extract_description.return_value = ''
+    docs.index_complete.return_value = False
+    completer = mock.Mock()
+    completer.last_option = ''
+    completer.current_command_key = b'aws.ec2'
+    shell = app.AWSShell(completer, mock.Mock(), docs)
+    shell.show_help = True
+    cli = mock.Mock()
+    cli.buffers = {'clidocs': mock.Mock()}
+    cli.eventloop = ImmediateEventLoop()
+    cli.current_buffer.document.text = 'ec2'
+
+    shell.on_input_timeout(cli)
+    docs.extract_description.return_value = 'ec2 docs'
+    shell.on_input_timeout(cli)
+    assert docs.extract_description.call_count == 2
+    assert shell.current_docs == 'ec2 docs'
+
+
+def test_edit_history_file_is_private_temp_file():
+    edit_history_file = app.EditHistoryFile()
+    try:
+        edit_history_file.sync(['aws s3 ls'])
+        filename = edit_history_file.filename
+        assert os.path.basename(filename).startswith('awsshell-edit-')
+        if not compat.ON_WINDOWS:
+            assert os.stat(filename).st_mode & 0o777 == 0o600
+        with open(filename) as f:
+            assert f.read() == 'aws s3 ls\n'
+    finally:
+        edit_history_file.remove()
+    assert not os.path.exists(filename)
+
+
+def test_edit_history_file_removed_when_run_raises():
+    shell = app.AWSShell(mock.Mock(), mock.Mock(), mock.Mock())
+    shell.edit_history_file = mock.Mock()
+    shell.create_cli_interface = mock.Mock()
+    shell.create_cli_interface.return_value.run.side_effect = ValueError()
+    with pytest.raises(ValueError):
+        shell.run()
+    assert shell.edit_history_file.remove.called
+
+
+def test_missing_docs_not_looked_up_again_when_index_complete():
+    docs = mock.Mock()
+    docs.extract_param.return_value = ''
+    docs.index_complete.return_value = True
+    completer = mock.Mock()
+    completer.last_option = '--no-such-option'
+    completer.current_command_key = b'aws.ec2'
+    shell = app.AWSShell(completer, mock.Mock(), docs)
+    shell.show_help = True
+    cli = mock.Mock()
+    cli.buffers = {'clidocs': mock.Mock()}
+    cli.eventloop = ImmediateEventLoop()
+    cli.current_buffer.document.text = 'ec2 --no-such-option'
+
+    shell.on_input_timeout(cli)
+    shell.on_input_timeout(cli)
+    assert docs.extract_param.call_count == 1
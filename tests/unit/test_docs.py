@@ -1,3 +1,5 @@
+import mock
+
 from awsshell import docs
 from awsshell import db
 
@@ -12,3 +14,40 @@ def test_load_doc_db(tmpdir):
     filename = tmpdir.join("foo.db").strpath
     d = docs.load_doc_db(filename)
     assert isinstance(d, db.ConcurrentDBM)
+
+
+def test_extracted_docs_are_cached():
+    doc_index = mock.Mock()
+    doc_index.__getitem__ = mock.Mock(
+        return_value='desc SYNOPSIS OPTIONS --foo bar --baz qux')
+    retriever = docs.DocRetriever(doc_index)
+    assert retriever.extract_description('ec2') == 'desc '
+    assert retriever.extract_description('ec2') == 'desc '
+    assert retriever.extract_param('ec2', '--foo') == '--foo bar '
+    assert retriever.extract_param('ec2', '--foo') == '--foo bar '
+    assert doc_index.__getitem__.call_count == 2
+
+
+def test_missing_docs_are_not_cached():
+    doc_index = {}
+    retriever = docs.DocRetriever(doc_index)
+    assert retriever.extract_description('ec2') == ''
+    doc_index['ec2'] = 'ec2 docs'
+    assert retriever.extract_description('ec2') == 'ec2 docs'
+
+
+def test_doc_cache_is_bounded():
+    doc_index = {'ec2': 'ec2 docs'}
+    retriever = docs.DocRetriever(doc_index)
+    retriever.MAX_CACHE_SIZE = 2
+    for param in ['--a', '--b', '--c']:
+        retriever.extract_param('ec2', param)
+    assert len(retriever._cache) == 2
+
+
+def test_index_complete():
+    doc_index = {}
+    retriever = docs.DocRetriever(doc_index)
+    assert not retriever.index_complete()
+    doc_index['__complete__'] = 'true'
+    assert retriever.index_complete()
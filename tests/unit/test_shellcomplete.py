@@ -0,0 +1,14 @@
+import mock
+
+from awsshell import shellcomplete
+
+
+def test_current_command_key_tracks_cmd_path():
+    model_completer = mock.Mock()
+    model_completer.cmd_path = ['aws', 'ec2']
+    completer = shellcomplete.AWSShellCompleter(
+        model_completer, server_side_completer=mock.Mock())
+    assert completer.current_command_key == b'aws.ec2'
+    assert completer.current_command_key is completer.current_command_key
+    model_completer.cmd_path.append('describe-instances')
+    assert completer.current_command_key == b'aws.ec2.describe-instances'